@@ -1 +1 @@
-from .fastq import FASTQReader, FASTQRecord
\ No newline at end of file
+from .fastq import FASTQReader, FASTQRecord, FASTQBatch
@@ -1,11 +1,24 @@
 import gzip
+import io
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen, PIPE
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
+# python-isal provides an ISA-L accelerated drop-in for gzip (~3x faster
+# decompression). Fall back to the stdlib when it is not installed.
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
 # Import the Cython-accelerated functions.
-from .fastq_cython import trim_records_cython, filter_quality_cython
+from .fastq_cython import (trim_records_cython, parse_filter_cython,
+                           extract_fixed_width, RecordIterator)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -21,181 +34,440 @@ class FASTQRecord:
         return f"FASTQRecord(info={self.info}, seq={self.seq}, quality={self.quality})"
 
 
+class FASTQBatch:
+    """
+    A batch of FASTQ records stored column-wise as three parallel pyarrow
+    large_binary arrays (info, seq, quality). Compared to one FASTQRecord
+    object per read this cuts memory several-fold and keeps each column
+    contiguous for Arrow compute kernels. Indexing and iteration build
+    FASTQRecord objects on demand for compatibility; avoid them in hot
+    paths and work on the columns directly instead.
+    """
+
+    def __init__(self, info, seq, quality):
+        self.info = info
+        self.seq = seq
+        self.quality = quality
+
+    def __len__(self):
+        return len(self.info)
+
+    def __getitem__(self, index):
+        return FASTQRecord(self.info[index].as_py(),
+                           self.seq[index].as_py(),
+                           self.quality[index].as_py())
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_table(self):
+        """Return the batch as a pyarrow Table with info/seq/quality columns."""
+        return pa.table({"info": self.info, "seq": self.seq, "quality": self.quality})
+
+    def __repr__(self):
+        return f"FASTQBatch(num_records={len(self)})"
+
+
 def is_gzipped(file_path):
     return file_path.endswith('.gz')
 
 
-def open_file(file_path):
+def _find_gzip_program():
+    """Return the name of an external gzip decompressor on $PATH, or None."""
+    for prog in ("igzip", "pigz"):
+        if shutil.which(prog):
+            return prog
+    return None
+
+
+class _PipedGzipReader:
+    """Binary stream fed by an external decompressor subprocess.
+
+    Decompression runs in a separate OS process, so it overlaps with the
+    Python/Cython work on this side of the pipe. Closing the stream also
+    reaps the child process. The child's exit status is checked once the
+    stream has been read to EOF (or on close), so a truncated or corrupt
+    .gz raises instead of silently yielding partial data; its stderr is
+    captured and included in the error rather than leaking to ours.
+    """
+
+    def __init__(self, proc):
+        self._proc = proc
+        self._stream = proc.stdout
+        self._eof = False
+
+    def _check_exit(self):
+        """Reap the child and raise if decompression failed."""
+        if self._proc.wait() != 0:
+            stderr = b""
+            if self._proc.stderr is not None:
+                stderr = self._proc.stderr.read()
+                self._proc.stderr.close()
+            raise OSError(
+                f"gzip decompressor exited with status {self._proc.returncode}: "
+                f"{stderr.decode('ascii', errors='replace').strip()}")
+
+    def _at_eof(self):
+        if not self._eof:
+            self._eof = True
+            self._check_exit()
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        if not data:
+            self._at_eof()
+        return data
+
+    def readline(self, size=-1):
+        line = self._stream.readline(size)
+        if not line:
+            self._at_eof()
+        return line
+
+    def readlines(self, hint=-1):
+        lines = self._stream.readlines(hint)
+        if not lines:
+            self._at_eof()
+        return lines
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def close(self):
+        if not self._stream.closed:
+            self._stream.close()
+            if self._proc.poll() is None:
+                # Early close of a partially consumed stream: the child is
+                # still producing, so terminate it without judging its
+                # exit status.
+                self._proc.terminate()
+                self._proc.wait()
+            elif not self._eof:
+                # The child already finished but no read observed EOF;
+                # surface a decompression failure here instead of never.
+                self._eof = True
+                self._check_exit()
+            if self._proc.stderr is not None and not self._proc.stderr.closed:
+                self._proc.stderr.close()
+
+    def __del__(self):
+        self.close()
+
+
+def open_file(file_path, buffer_size=None):
+    """Open a FASTQ(.gz) file in binary mode.
+
+    FASTQ is ASCII, so records are kept as bytes all the way into the
+    Cython kernels instead of paying a UTF-8 decode per line.
+    buffer_size overrides the default read buffer: 128 KiB on plain files
+    (matching cat/pigz) and 1 MiB when a gzip decompressor feeds us.
+    """
     if is_gzipped(file_path):
-        return gzip.open(file_path, 'rt')
+        size = buffer_size if buffer_size is not None else 1 << 20
+        # Fallback chain: external igzip/pigz subprocess -> python-isal -> gzip.
+        prog = _find_gzip_program()
+        if prog is not None:
+            proc = Popen([prog, "-cd", file_path], stdout=PIPE, stderr=PIPE,
+                         bufsize=size)
+            return _PipedGzipReader(proc)
+        gz_open = igzip.open if igzip is not None else gzip.open
+        return io.BufferedReader(gz_open(file_path, 'rb'), buffer_size=size)
     else:
-        return open(file_path, 'r')
+        size = buffer_size if buffer_size is not None else 128 * 1024
+        return open(file_path, 'rb', buffering=size)
 
 
 def load_chunk(file_handle, chunk_size):
     """
-    Reads chunk_size * 4 lines (each FASTQ record has 4 lines) from file_handle.
-    Returns a list of lines.
+    Reads roughly chunk_size records (each FASTQ record has 4 lines) from
+    file_handle in one bulk readlines() call instead of 4 * chunk_size
+    per-line round-trips through the interpreter.
+    Returns a list of lines with trailing newlines stripped.
+    """
+    # Estimate the byte budget from a typical ~100 bp record (4 lines).
+    hint = chunk_size * 400
+    lines = file_handle.readlines(hint)
+    # readlines(hint) stops on a line boundary, not a record boundary; top
+    # up so a record is never split across two chunks.
+    while len(lines) % 4:
+        line = file_handle.readline()
+        if not line:
+            break
+        lines.append(line)
+    return [l[:-1] if l.endswith(b"\n") else l for l in lines]
+
+
+def _split_record_boundary(data):
+    """
+    Split a raw byte block into (complete, carry) where `complete` covers
+    whole 4-line records and `carry` is the trailing partial record to
+    prepend to the next block. Uses only count/rfind, which run at memchr
+    speed, so the split never touches individual lines.
+    """
+    cut = len(data)
+    if not data.endswith(b"\n"):
+        cut = data.rfind(b"\n") + 1
+    remainder = data.count(b"\n", 0, cut) % 4
+    for _ in range(remainder):
+        cut = data.rfind(b"\n", 0, cut - 1) + 1
+    return data[:cut], data[cut:]
+
+
+def _concat_binary(chunks):
+    """Concatenate per-chunk lists of bytes into one large_binary Array."""
+    arrays = [pa.array(chunk, type=pa.large_binary()) for chunk in chunks]
+    if not arrays:
+        return pa.array([], type=pa.large_binary())
+    return pa.concat_arrays(arrays)
+
+
+def _extract_chunk(lines, start, end):
+    """
+    Slice [start:end] out of every sequence line (index 1, 5, 9, ...) of a
+    chunk. For the common fixed-width window (e.g. 16 bp barcodes) the
+    Cython memcpy kernel fills one contiguous buffer that backs a zero-copy
+    FixedSizeBinaryArray; otherwise Arrow's vectorized binary_slice kernel
+    runs over the whole chunk in one C call.
+    Returns a pyarrow binary Array.
     """
-    lines = []
-    try:
-        for _ in range(chunk_size * 4):
-            lines.append(next(file_handle).rstrip("\n"))
-    except StopIteration:
-        pass
-    return lines
+    seqs = lines[1::4]
+    if 0 <= start < end:
+        width = end - start
+        buf = extract_fixed_width(seqs, start, width)
+        if buf is not None:
+            return pa.Array.from_buffers(pa.binary(width), len(seqs),
+                                         [None, pa.py_buffer(buf)])
+    arr = pa.array(seqs, type=pa.large_binary())
+    return pc.binary_slice(arr, start=start, stop=end)
 
 
 class FASTQReader:
-    def __init__(self, file_path, thread=4, chunk_size=1000000):
+    def __init__(self, file_path, thread=4, chunk_size=1000000, buffer_size=None):
         """
         Parameters:
           file_path: Path to a FASTQ or FASTQ.gz file.
           thread: Number of threads to use for concurrent chunk loading.
           chunk_size: Number of records to process per chunk.
+          buffer_size: Read buffer size in bytes; defaults to 128 KiB for
+            plain files and 1 MiB for gzip input. Tune for NVMe vs pipe.
         """
         self.file_path = file_path
         self.thread = thread
         self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
         self._is_gz = is_gzipped(file_path)
         self._file = None
+        self._consumed = False
+        # One pool for the reader's lifetime; per-method pools paid thread
+        # creation on every call and serialized pipelines that chain methods.
+        self._executor = ThreadPoolExecutor(max_workers=thread)
 
     def _open_file(self):
-        self._file = open_file(self.file_path)
+        self._file = open_file(self.file_path, self.buffer_size)
 
     def _reset_file(self):
         if self._file:
             self._file.close()
         self._open_file()
 
-    def __iter__(self):
-        self._reset_file()
-        return self._record_generator()
+    def _ensure_fresh(self):
+        """
+        Reopen the file only when it has already been read from. A freshly
+        opened reader skips the close/reopen cycle — on gzip input that
+        also skips a decompressor re-init. Resets are paid lazily by the
+        next consumer instead of as a trailing cost of every method.
+        """
+        if self._file is None or self._consumed:
+            self._reset_file()
+        self._consumed = True
 
-    def _record_generator(self):
-        """Yield FASTQRecord objects one at a time (lazy iteration)."""
-        while True:
-            try:
-                info = next(self._file).rstrip("\n")
-                seq = next(self._file).rstrip("\n")
-                next(self._file)  # skip the plus line
-                quality = next(self._file).rstrip("\n")
-                yield FASTQRecord(info, seq, quality)
-            except StopIteration:
-                break
+    def close(self):
+        """Shut down the shared thread pool and close the file handle."""
+        self._executor.shutdown()
+        if self._file:
+            self._file.close()
+            self._file = None
 
-    def count_reads(self):
-        """Counts the total number of records by processing the file in chunks using multiple threads."""
-        self._reset_file()
-        count = 0
-        executor = ThreadPoolExecutor(max_workers=self.thread)
-        futures = []
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        """Iterate FASTQRecord objects lazily via the Cython RecordIterator,
+        which scans a refilled byte buffer with memchr instead of making
+        four Python-level next() calls per record."""
+        self._ensure_fresh()
+        return RecordIterator(self._file, FASTQRecord)
 
+    def _stream_chunks(self, func, *args):
+        """
+        Submit func(lines, *args) for each chunk and yield the results in
+        submission order. At most thread * 2 futures are in flight, so
+        memory stays bounded to O(thread) chunks instead of the whole file
+        and the shared pool's queue never grows unbounded.
+        """
+        pending = deque()
+        max_pending = self.thread * 2
         while True:
             lines = load_chunk(self._file, self.chunk_size)
             if not lines:
                 break
-            futures.append(executor.submit(lambda l: len(l) // 4, lines))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(self._executor.submit(func, lines, *args))
+        while pending:
+            yield pending.popleft().result()
 
-        for future in as_completed(futures):
-            count += future.result()
+    def _stream_blocks(self, func, *args):
+        """
+        Raw-block analogue of _stream_chunks: read binary blocks, cut them
+        on record boundaries, and yield func(block, *args) results in
+        submission order with at most thread * 2 futures in flight.
+        """
+        pending = deque()
+        max_pending = self.thread * 2
+        block_size = self.chunk_size * 400
+        carry = b""
+        while True:
+            data = self._file.read(block_size)
+            if not data:
+                break
+            block, carry = _split_record_boundary(carry + data)
+            if not block:
+                continue
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(self._executor.submit(func, block, *args))
+        if carry:
+            # A file without a trailing newline leaves its last record in
+            # the carry; complete the final line and parse what remains.
+            if not carry.endswith(b"\n"):
+                carry += b"\n"
+            block, _ = _split_record_boundary(carry)
+            if block:
+                pending.append(self._executor.submit(func, block, *args))
+        while pending:
+            yield pending.popleft().result()
 
-        executor.shutdown()
-        self._reset_file()
-        return count
+    def count_reads(self):
+        """
+        Counts the total number of records by counting newlines in raw byte
+        blocks and dividing by 4 — bytes.count is a single memchr-style scan,
+        so no line structure is ever parsed.
+        """
+        self._ensure_fresh()
+        newlines = 0
+        pending = deque()
+        max_pending = self.thread * 2
+        last_byte = b"\n"
+        while True:
+            buf = self._file.read(16 << 20)
+            if not buf:
+                break
+            last_byte = buf[-1:]
+            if len(pending) >= max_pending:
+                newlines += pending.popleft().result()
+            pending.append(self._executor.submit(buf.count, b"\n"))
+        while pending:
+            newlines += pending.popleft().result()
+        if last_byte != b"\n":
+            # The final line has no trailing newline but is still a line.
+            newlines += 1
+        return newlines // 4
 
     def trim(self, five_prime=0, three_prime=0):
         """
         Trims each record's sequence and quality strings by removing bases from
         the 5' and 3' ends using Cython-accelerated code.
-        Returns a list of trimmed FASTQRecord objects.
+        Returns a FASTQBatch of trimmed records.
         """
-        self._reset_file()
-        trimmed_records = []
-        executor = ThreadPoolExecutor(max_workers=self.thread)
-        futures = []
-        while True:
-            lines = load_chunk(self._file, self.chunk_size)
-            if not lines:
-                break
-            # Group lines into records (4 lines each)
-            records = []
-            for i in range(0, len(lines), 4):
-                if i + 3 < len(lines):
-                    records.append((lines[i], lines[i+1], lines[i+3]))
-            futures.append(executor.submit(trim_records_cython, records, five_prime, three_prime))
-        for future in as_completed(futures):
-            result = future.result()
-            for rec in result:
-                trimmed_records.append(FASTQRecord(*rec))
-        executor.shutdown()
-        self._reset_file()
-        return trimmed_records
+        self._ensure_fresh()
+        info_chunks, seq_chunks, qual_chunks = [], [], []
+        # The Cython kernel does the stride-4 record indexing itself.
+        for infos, seqs, qualities in self._stream_chunks(trim_records_cython, five_prime, three_prime):
+            info_chunks.append(infos)
+            seq_chunks.append(seqs)
+            qual_chunks.append(qualities)
+        return FASTQBatch(_concat_binary(info_chunks),
+                          _concat_binary(seq_chunks),
+                          _concat_binary(qual_chunks))
 
     def filter_quality(self, threshold):
         """
-        Filters records based on average quality (Phred+33) using Cython-accelerated code.
-        Returns a list of FASTQRecord objects that meet or exceed the threshold.
+        Filters records based on average quality (Phred+33) using the fused
+        Cython parse+filter kernel, which scans the raw byte blocks directly
+        instead of going through load_chunk's line list.
+        Returns a FASTQBatch of records that meet or exceed the threshold.
         """
-        self._reset_file()
-        filtered_records = []
-        executor = ThreadPoolExecutor(max_workers=self.thread)
-        futures = []
-        while True:
-            lines = load_chunk(self._file, self.chunk_size)
-            if not lines:
-                break
-            records = []
-            for i in range(0, len(lines), 4):
-                if i + 3 < len(lines):
-                    records.append((lines[i], lines[i+1], lines[i+3]))
-            futures.append(executor.submit(filter_quality_cython, records, threshold))
-        for future in as_completed(futures):
-            result = future.result()
-            for rec in result:
-                filtered_records.append(FASTQRecord(*rec))
-        executor.shutdown()
-        self._reset_file()
-        return filtered_records
-
-    def extract(self, start, end, save_parquet=False, parquet_prefix="extracted"):
+        self._ensure_fresh()
+        info_chunks, seq_chunks, qual_chunks = [], [], []
+        for infos, seqs, qualities in self._stream_blocks(parse_filter_cython, threshold):
+            info_chunks.append(infos)
+            seq_chunks.append(seqs)
+            qual_chunks.append(qualities)
+        return FASTQBatch(_concat_binary(info_chunks),
+                          _concat_binary(seq_chunks),
+                          _concat_binary(qual_chunks))
+
+    def extract_iter(self, start, end):
+        """
+        Extracts a substring from each record's sequence, yielding one
+        pyarrow large_binary Array per chunk in file order. Streaming keeps
+        memory bounded regardless of file size; call .to_pylist() on the
+        arrays when plain Python bytes are needed.
+        """
+        self._ensure_fresh()
+        for result in self._stream_chunks(_extract_chunk, start, end):
+            yield result
+
+    def extract(self, start, end, save_parquet=False, parquet_prefix="extracted",
+                verbose=False):
         """
         Extracts a substring from each record's sequence.
         If save_parquet is True, writes the results to a Parquet file.
         Otherwise, returns a list of extracted substrings.
+        Progress reporting is opt-in via verbose: per-chunk writes on the
+        collection loop sit on the critical path, so nothing is emitted
+        unless asked for.
         """
-        self._reset_file()
-        extracted = []
-        chunk_index = 0
-        executor = ThreadPoolExecutor(max_workers=self.thread)
-        futures = []
-
-        while True:
-            lines = load_chunk(self._file, self.chunk_size)
-            if not lines:
-                break
-            records = []
-            for i in range(0, len(lines), 4):
-                if i + 1 < len(lines):
-                    records.append(lines[i+1])  # sequence only
-            futures.append((chunk_index, executor.submit(lambda recs: [seq[start:end] for seq in recs], records)))
-            chunk_index += 1
-
-        results = [None] * chunk_index
-        for index, future in futures:
-            results[index] = future.result()
-
-        for result in results:
-            extracted.extend(result)
-
-        executor.shutdown()
-        self._reset_file()
+        def _chunks():
+            for index, arr in enumerate(self.extract_iter(start, end)):
+                if verbose:
+                    logger.info(f"extract: processed chunk {index + 1} ({len(arr)} records)")
+                yield arr
 
         if save_parquet:
-            table = pa.Table.from_pydict({"extracted": extracted})
             filename = f"{parquet_prefix}.parquet"
-            pq.write_table(table, filename)
+            schema = pa.schema([("extracted", pa.large_binary())])
+            # Dictionary + RLE encoding pays off on repetitive barcode data;
+            # 1 MiB data pages keep the page overhead low at these row counts.
+            writer = pq.ParquetWriter(filename, schema, compression="zstd",
+                                      use_dictionary=True, data_page_size=1 << 20)
+            try:
+                # One RecordBatch per chunk: memory stays bounded and the
+                # writer gets batched columnar appends instead of one giant
+                # table built row by row.
+                for arr in _chunks():
+                    if arr.type != pa.large_binary():
+                        # Fixed-width fast-path chunks come back as
+                        # fixed_size_binary; normalize for the writer.
+                        arr = arr.cast(pa.large_binary())
+                    writer.write_batch(pa.record_batch([arr], schema=schema),
+                                       row_group_size=self.chunk_size)
+            finally:
+                writer.close()
             logger.info(f"Saved parquet file: {filename}")
             return None
-        else:
-            return extracted
\ No newline at end of file
+        extracted = []
+        for arr in _chunks():
+            extracted.extend(arr.to_pylist())
+        return extracted
\ No newline at end of file
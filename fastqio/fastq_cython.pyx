@@ -1,59 +1,240 @@
 # cython: boundscheck=False, wraparound=False, language_level=3
 
 cimport cython
+from libc.stdlib cimport malloc, free
+from libc.string cimport memchr, memcpy
+
+cdef extern from *:
+    """
+    #include <stdint.h>
+    #include <stddef.h>
+    #if defined(__AVX2__)
+    #include <immintrin.h>
+    #endif
+
+    /* Sum the raw byte values of a quality string. The AVX2 path uses
+     * _mm256_sad_epu8 against zero to add 32 bytes per instruction; the
+     * scalar tail (and the whole loop on non-AVX2 targets such as Apple
+     * silicon) is simple enough for compilers to auto-vectorize at -O3.
+     * The Phred+33 offset is subtracted by the caller as 33 * n. */
+    static inline uint64_t fastqio_sum_phred(const uint8_t* p, size_t n) {
+        uint64_t total = 0;
+        size_t i = 0;
+    #if defined(__AVX2__)
+        __m256i acc = _mm256_setzero_si256();
+        const __m256i zero = _mm256_setzero_si256();
+        for (; i + 32 <= n; i += 32) {
+            __m256i v = _mm256_loadu_si256((const __m256i*)(p + i));
+            acc = _mm256_add_epi64(acc, _mm256_sad_epu8(v, zero));
+        }
+        uint64_t lanes[4];
+        _mm256_storeu_si256((__m256i*)lanes, acc);
+        total = lanes[0] + lanes[1] + lanes[2] + lanes[3];
+    #endif
+        for (; i < n; i++)
+            total += p[i];
+        return total;
+    }
+    """
+    unsigned long long fastqio_sum_phred(const unsigned char* p, size_t n) nogil
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def trim_records_cython(list records, int five_prime, int three_prime):
+def trim_records_cython(list lines, int five_prime, int three_prime):
     """
     Cython-accelerated function to trim FASTQ records.
-    Each record is a tuple: (info, seq, quality)
-    Returns a list of tuples with trimmed (info, seq, quality).
-    """
-    cdef int n = len(records)
-    cdef list result = []
-    cdef int len_seq, start, end, i
-    cdef tuple rec
-    cdef str info, seq, quality
-    for i in range(n):
-        rec = records[i]
-        info = rec[0]
-        seq = rec[1]
-        quality = rec[2]
+    Takes the flat chunk line list (4 bytes lines per record) and does the
+    stride-4 indexing here, avoiding a per-record tuple allocation in Python.
+    Returns three parallel lists (infos, seqs, qualities) laid out SoA so
+    the caller can build columnar batches without repacking.
+    """
+    cdef Py_ssize_t n = len(lines)
+    cdef Py_ssize_t n_records = n // 4
+    # Exactly one output per record, so preallocate instead of growing
+    # through list.append's geometric reallocs.
+    cdef list infos = [None] * n_records
+    cdef list seqs = [None] * n_records
+    cdef list qualities = [None] * n_records
+    cdef int len_seq, start, end
+    cdef Py_ssize_t i, r
+    cdef bytes seq, quality
+    for r in range(n_records):
+        i = r * 4
+        seq = lines[i + 1]
+        quality = lines[i + 3]
         len_seq = len(seq)
         start = five_prime if five_prime < len_seq else len_seq
         end = len_seq - three_prime if (len_seq - three_prime) > start else start
-        result.append((info, seq[start:end], quality[start:end]))
-    return result
+        infos[r] = lines[i]
+        seqs[r] = seq[start:end]
+        qualities[r] = quality[start:end]
+    return infos, seqs, qualities
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def filter_quality_cython(list records, int threshold):
+def parse_filter_cython(bytes block, int threshold):
     """
-    Cython-accelerated function to filter FASTQ records based on average quality (Phred+33).
-    Each record is a tuple: (info, seq, quality).
-    Returns a list of tuples that meet or exceed the quality threshold.
+    Fused parse + quality filter over a raw byte block of whole FASTQ
+    records: one memchr scan locates every newline and the Phred+33 sums
+    are computed inline, all in a single nogil pass over the buffer, so
+    no intermediate line list or rstrip pass is ever materialized.
+    Returns three parallel lists (infos, seqs, qualities) with the records
+    that meet or exceed the quality threshold.
     """
-    cdef int n = len(records)
-    cdef list result = []
-    cdef int i, j, total, q, length
+    cdef const char* base = block
+    cdef Py_ssize_t n = len(block)
+    cdef Py_ssize_t n_lines = block.count(b"\n")
+    cdef Py_ssize_t n_records = n_lines // 4
+    cdef list infos = []
+    cdef list seqs = []
+    cdef list qualities = []
+    cdef Py_ssize_t i, r, k, pos, q_start, q_end, length
+    cdef const char* nl
     cdef float avg
-    cdef tuple rec
-    cdef str info, seq, quality
+    cdef Py_ssize_t* starts
+    cdef Py_ssize_t* ends
+    cdef long* qual_sums
+    if n_records == 0:
+        return infos, seqs, qualities
+    # Preallocate to the upper bound (every record passes) and trim after.
+    infos = [None] * n_records
+    seqs = [None] * n_records
+    qualities = [None] * n_records
+    starts = <Py_ssize_t*>malloc(n_lines * sizeof(Py_ssize_t))
+    ends = <Py_ssize_t*>malloc(n_lines * sizeof(Py_ssize_t))
+    qual_sums = <long*>malloc(n_records * sizeof(long))
+    if starts == NULL or ends == NULL or qual_sums == NULL:
+        free(starts)
+        free(ends)
+        free(qual_sums)
+        raise MemoryError()
+    try:
+        with nogil:
+            pos = 0
+            for i in range(n_lines):
+                nl = <const char*>memchr(base + pos, 10, n - pos)
+                starts[i] = pos
+                ends[i] = nl - base
+                pos = ends[i] + 1
+            for r in range(n_records):
+                q_start = starts[r * 4 + 3]
+                q_end = ends[r * 4 + 3]
+                qual_sums[r] = <long>fastqio_sum_phred(
+                    <const unsigned char*>(base + q_start), <size_t>(q_end - q_start))
+        # Materialize only the passing records (GIL held).
+        k = 0
+        for r in range(n_records):
+            i = r * 4
+            length = ends[i + 3] - starts[i + 3]
+            if length == 0:
+                continue
+            avg = (qual_sums[r] - 33 * length) / <float>length
+            if avg >= threshold:
+                infos[k] = block[starts[i]:ends[i]]
+                seqs[k] = block[starts[i + 1]:ends[i + 1]]
+                qualities[k] = block[starts[i + 3]:ends[i + 3]]
+                k += 1
+        del infos[k:]
+        del seqs[k:]
+        del qualities[k:]
+    finally:
+        free(starts)
+        free(ends)
+        free(qual_sums)
+    return infos, seqs, qualities
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def extract_fixed_width(list seqs, int start, int k):
+    """
+    Copy seqs[i][start:start + k] for every sequence into one contiguous
+    bytearray of stride k — a fixed-size memcpy per record instead of a
+    Python slice allocation, and the result can back a zero-copy Arrow
+    FixedSizeBinaryArray. Returns None when any sequence is too short for
+    the window so the caller can fall back to the variable-width path.
+    """
+    cdef Py_ssize_t n = len(seqs)
+    cdef bytearray out = bytearray(n * k)
+    cdef char* dst = out
+    cdef bytes s
+    cdef const char* src
+    cdef Py_ssize_t i
     for i in range(n):
-        rec = records[i]
-        info = rec[0]
-        seq = rec[1]
-        quality = rec[2]
-        length = len(quality)
-        if length == 0:
-            continue
-        total = 0
-        for j in range(length):
-            # Convert character to quality score assuming Phred+33.
-            q = ord(quality[j]) - 33
-            total += q
-        avg = total / length
-        if avg >= threshold:
-            result.append((info, seq, quality))
-    return result
\ No newline at end of file
+        s = seqs[i]
+        if len(s) < start + k:
+            return None
+        src = s
+        memcpy(dst + i * k, src + start, k)
+    return out
+
+cdef class RecordIterator:
+    """
+    Iterator over a binary FASTQ stream. Maintains an internal byte buffer
+    refilled in large reads and locates the 4 newlines of each record with
+    memchr, so no Python-level next()/rstrip runs per line. Yields
+    record_cls(info, seq, quality) objects.
+    """
+    cdef object fh
+    cdef object record_cls
+    cdef bytes buf
+    cdef Py_ssize_t pos
+    cdef Py_ssize_t read_size
+    cdef bint padded
+
+    def __cinit__(self, fh, record_cls, Py_ssize_t read_size=1 << 20):
+        self.fh = fh
+        self.record_cls = record_cls
+        self.buf = b""
+        self.pos = 0
+        self.read_size = read_size
+        self.padded = False
+
+    def __iter__(self):
+        return self
+
+    cdef bint _fill(self):
+        """Append the next block from the stream; returns False at EOF."""
+        data = self.fh.read(self.read_size)
+        if not data:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:] + data
+            self.pos = 0
+        else:
+            self.buf = self.buf + data
+        return True
+
+    def __next__(self):
+        cdef const char* base
+        cdef const char* nl
+        cdef Py_ssize_t n, p, i
+        cdef Py_ssize_t line_starts[4]
+        cdef Py_ssize_t line_ends[4]
+        cdef bint found
+        while True:
+            base = self.buf
+            n = len(self.buf)
+            p = self.pos
+            found = True
+            for i in range(4):
+                line_starts[i] = p
+                nl = <const char*>memchr(base + p, 10, n - p)
+                if nl == NULL:
+                    found = False
+                    break
+                line_ends[i] = nl - base
+                p = line_ends[i] + 1
+            if found:
+                self.pos = p
+                return self.record_cls(self.buf[line_starts[0]:line_ends[0]],
+                                       self.buf[line_starts[1]:line_ends[1]],
+                                       self.buf[line_starts[3]:line_ends[3]])
+            if not self._fill():
+                # EOF: a file without a trailing newline still ends in a
+                # complete record; pad once and retry. Anything shorter
+                # than 4 lines is a truncated record and is dropped.
+                if not self.padded and self.pos < len(self.buf) and not self.buf.endswith(b"\n"):
+                    self.buf = self.buf + b"\n"
+                    self.padded = True
+                    continue
+                raise StopIteration
@@ -4,12 +4,13 @@ import numpy as np
 
 extensions = [
     Extension("fastqio.fastq_cython", ["fastqio/fastq_cython.pyx"],
-              include_dirs=[np.get_include()])
+              include_dirs=[np.get_include()],
+              extra_compile_args=["-O3"])
 ]
 
 setup(
     name="fastqio",
-    version="0.2.0",
+    version="0.3.0",
     description="FASTQ parser with multi-threaded I/O and Cython-accelerated string handling",
     author="Joseph Chao-Chung Kuo",
     author_email="chao-chung.kuo@rwth-aachen.de",
@@ -1,3 +1,4 @@
+import gzip
 import os
 import tempfile
 import pytest
@@ -19,25 +20,48 @@ def sample_fastq(tmp_path):
     file_path.write_text(content)
     return str(file_path)
 
+@pytest.fixture
+def sample_fastq_gz(tmp_path, sample_fastq):
+    file_path = tmp_path / "sample.fastq.gz"
+    with open(sample_fastq, "rb") as src, gzip.open(file_path, "wb") as dst:
+        dst.write(src.read())
+    return str(file_path)
+
 def test_count_reads(sample_fastq):
     reader = FASTQReader(sample_fastq, thread=4, chunk_size=1)
     count = reader.count_reads()
     assert count == 2
 
+def test_count_reads_gzipped(sample_fastq_gz):
+    reader = FASTQReader(sample_fastq_gz, thread=4, chunk_size=1)
+    assert reader.count_reads() == 2
+
+def test_truncated_gzip_raises_subprocess_path(tmp_path, sample_fastq_gz, monkeypatch):
+    # Cut the gzip stream in half: the decompressor child exits nonzero and
+    # the reader must raise instead of silently returning partial data.
+    import fastqio.fastq as fastq_mod
+    data = open(sample_fastq_gz, "rb").read()
+    truncated = tmp_path / "truncated.fastq.gz"
+    truncated.write_bytes(data[:len(data) // 2])
+    monkeypatch.setattr(fastq_mod, "_find_gzip_program", lambda: "gzip")
+    reader = FASTQReader(str(truncated), thread=4, chunk_size=1)
+    with pytest.raises(OSError):
+        reader.count_reads()
+
 def test_iteration(sample_fastq):
     reader = FASTQReader(sample_fastq, thread=4, chunk_size=1)
     records = list(reader)
     assert len(records) == 2
-    assert records[0].info.startswith("@read1")
-    assert records[1].info.startswith("@read2")
+    assert records[0].info.startswith(b"@read1")
+    assert records[1].info.startswith(b"@read2")
 
 def test_trim(sample_fastq):
     reader = FASTQReader(sample_fastq, thread=4, chunk_size=1)
     trimmed = reader.trim(five_prime=2, three_prime=2)
     # For read1: "ACGTACGTACGT" trimmed -> "GTACGTAC"
     # For read2: "TGCAAGCTTGCA" trimmed -> "CAAGCTTG"
-    assert trimmed[0].seq == "GTACGTAC"
-    assert trimmed[1].seq == "CAAGCTTG"
+    assert trimmed[0].seq == b"GTACGTAC"
+    assert trimmed[1].seq == b"CAAGCTTG"
 
 def test_filter_quality():
     content = (
@@ -57,7 +81,7 @@ def test_filter_quality():
     filtered = reader.filter_quality(30)
     # Only the high-quality record should remain.
     assert len(filtered) == 1
-    assert filtered[0].info.startswith("@read2")
+    assert filtered[0].info.startswith(b"@read2")
     os.unlink(tmp_path)
 
 def test_extract(tmp_path, sample_fastq):
@@ -65,5 +89,14 @@ def test_extract(tmp_path, sample_fastq):
     extracted = reader.extract(start=2, end=6, save_parquet=False)
     # For read1: "ACGTACGTACGT" -> substring "GTAC"
     # For read2: "TGCAAGCTTGCA" -> substring "CAAG"
-    assert extracted[0] == "GTAC"
-    assert extracted[1] == "CAAG"
\ No newline at end of file
+    assert extracted[0] == b"GTAC"
+    assert extracted[1] == b"CAAG"
+
+def test_extract_parquet(tmp_path, sample_fastq, monkeypatch):
+    import pyarrow.parquet as pq
+    monkeypatch.chdir(tmp_path)
+    reader = FASTQReader(sample_fastq, thread=4, chunk_size=1)
+    result = reader.extract(start=2, end=6, save_parquet=True, parquet_prefix="extracted")
+    assert result is None
+    table = pq.read_table(str(tmp_path / "extracted.parquet"))
+    assert table.column("extracted").to_pylist() == [b"GTAC", b"CAAG"]
\ No newline at end of file